@@ -10,9 +10,15 @@ IME Dictionary Converter (no CLI params)
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple, Dict
+import functools
+import array
+import mmap
 import os
+import struct
+import sys
+import threading
 
 # ===================== CONFIG =====================
 ROOT_DIR = "."  # 改成你的目录（支持相对/绝对路径）
@@ -34,41 +40,33 @@ SCEL_START_CHINESE = 0x2628
 
 # ==================================================
 
-@dataclass
-class Entry:
-    word: str
-    pinyin: List[str]
-    freq: int = 1
+# 解析结果用三条平行数组（SoA）表示：词、拼音串、频次。
+# 相比每条目一个对象，省掉 ~10^5 级小对象的头部开销与指针追逐。
+Entries = Tuple[List[str], List[str], "array.array"]
 
 
-def _uniq_stable_words(entries: List[Entry]) -> List[str]:
-    seen = set()
-    out = []
-    for e in entries:
-        w = e.word.strip()
-        if not w or w in seen:
-            continue
-        seen.add(w)
-        out.append(w)
-    return out
-
+def write_outputs(entries: Entries, txt_path: str, yaml_path: str, name: str,
+                  want_txt: bool = True, want_yaml: bool = True) -> int:
+    """把 (words, pinyins, freqs) 平行数组写成 TXT 词表与 Rime YAML，返回条目总数。
 
-def write_words_txt(entries: List[Entry], out_path: str) -> None:
-    words = _uniq_stable_words(entries)
-    with open(out_path, "w", encoding="utf-8", newline="\n") as f:
-        for w in words:
-            f.write(w + "\n")
+    TXT 去重靠插入序 dict；YAML 按频次降序稳定排序后 setdefault，
+    同词取最大频次、首个拼音，输出天然按权重排列。
+    """
+    words, pinyins, freqs = entries
 
+    if want_txt:
+        uniq = list(dict.fromkeys(w for w in (w.strip() for w in words) if w))
+        # 整块拼好一次写出，免去逐行过 TextIO 编码层
+        with open(txt_path, "w", encoding="utf-8", newline="\n") as f:
+            if uniq:
+                f.write("\n".join(uniq) + "\n")
 
-def write_rime_yaml(entries: List[Entry], out_path: str, name: str) -> None:
-    # 去重：同词取最大频次、首个拼音
-    best: Dict[str, Tuple[List[str], int]] = {}
-    for e in entries:
-        cur = best.get(e.word)
-        if cur is None or (e.freq or 0) > (cur[1] or 0):
-            best[e.word] = (e.pinyin, e.freq if e.freq is not None else 1)
+    if want_yaml:
+        best: Dict[str, Tuple[str, int]] = {}
+        for i in sorted(range(len(words)), key=freqs.__getitem__, reverse=True):
+            best.setdefault(words[i], (pinyins[i], freqs[i]))
 
-    header = f"""# Rime dictionary
+        header = f"""# Rime dictionary
 # encoding: utf-8
 ---
 name: {name}
@@ -77,11 +75,32 @@ sort: by_weight
 use_preset_vocabulary: false
 ...
 """
-    with open(out_path, "w", encoding="utf-8", newline="\n") as f:
-        f.write(header)
-        for w, (py, freq) in best.items():
-            py_str = " ".join(py) if py else ""
-            f.write(f"{w}\t{py_str}\t{freq}\n")
+        lines = [f"{w}\t{py}\t{freq}" for w, (py, freq) in best.items()]
+        with open(yaml_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(header)
+            if lines:
+                f.write("\n".join(lines) + "\n")
+
+    return len(words)
+
+
+def _mmap_file(path: str):
+    """以只读 mmap 打开文件；空文件无法 mmap，返回 None。"""
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0,
+                             os.POSIX_FADV_SEQUENTIAL | os.POSIX_FADV_WILLNEED)
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+
+
+def _close_mmap(mm: mmap.mmap) -> None:
+    try:
+        mm.close()
+    except BufferError:
+        pass  # 解析异常时 traceback 还持有 memoryview，交给 GC 收尾
 
 
 # ------------------------- Baidu .bdict/.bcd -------------------------
@@ -96,203 +115,331 @@ BDICT_YM = [
 ]
 
 
-def _u16le(b: bytes, off: int) -> Tuple[int, int]:
-    if off + 2 > len(b):
-        raise EOFError
-    return b[off] | (b[1 + off] << 8), off + 2
+# 预拼好全部 声母×韵母 组合，查表代替热循环里的字符串拼接；intern 让重复音节共享内存
+_NYM = len(BDICT_YM)
+BDICT_COMBO = [sys.intern(sm + ym) for sm in BDICT_SM for ym in BDICT_YM]
+
+_U16 = struct.Struct("<H").unpack_from
+
+if sys.byteorder == "little":
+    def _u16_seq(b):
+        # frombytes 即 C 层 memcpy，把整块字节一次性转成 u16 序列
+        arr = array.array("H")
+        arr.frombytes(b)
+        return arr
+else:
+    def _u16_seq(b):
+        arr = array.array("H")
+        arr.frombytes(b)
+        arr.byteswap()
+        return arr
+
+
+def parse_baidu(path: str, start_offset: int = BAIDU_START_OFFSET) -> Entries:
+    mm = _mmap_file(path)
+    if mm is None:
+        return [], [], array.array("I")
+    try:
+        return _parse_baidu_buf(memoryview(mm), start_offset)
+    finally:
+        _close_mmap(mm)
+
 
+# 条目类型：1=普通（声母/韵母索引+词），2=英文，3=自带拼音串
+_B_NORMAL, _B_ENGLISH, _B_CODED = 1, 2, 3
 
-def parse_baidu(path: str, start_offset: int = BAIDU_START_OFFSET) -> List[Entry]:
-    data = open(path, "rb").read()
+# 排除掉 (0,0) 的 Type-3 后，首字节单独即可区分 Type-2/Type-1；
+# 预编码成 256 项表，一次索引代替逐项比较
+_NSM = len(BDICT_SM)
+_LEAD_TYPE = bytes(
+    _B_ENGLISH if b >= _NSM and b != 0xFF else _B_NORMAL for b in range(256)
+)
+
+
+def _scan_baidu(data, start_offset: int) -> List[tuple]:
+    """结构扫描：只做算术和边界检查，输出 (类型, freq, 拼音, 词区间) 记录。
+
+    拼音索引在扫描期就映射成字符串（需要同时做合法性校验）；
+    词本身只记录 (start, end) 字节区间，解码留给调用方统一处理。
+    """
     off = start_offset
     n = len(data)
-    out: List[Entry] = []
+    recs: List[tuple] = []
 
-    def remain() -> int:
-        return n - off
-
-    while remain() > 4:
-        try:
-            py_len, off = _u16le(data, off)
-            freq, off = _u16le(data, off)
-        except EOFError:
-            break
-        if remain() < 2:
+    while n - off > 4:
+        py_len, = _U16(data, off)
+        freq, = _U16(data, off + 2)
+        off += 4
+        if n - off < 2:
             break
         peek0, peek1 = data[off], data[off + 1]
 
         # Type 3
         if peek0 == 0x00 and peek1 == 0x00:
             off += 2
-            try:
-                word_len, off = _u16le(data, off)
-            except EOFError:
+            if n - off < 2:
                 break
-            need = py_len * 2 + word_len * 2
-            if remain() < need:
+            word_len, = _U16(data, off)
+            off += 2
+            if n - off < py_len * 2 + word_len * 2:
                 break
-            code = data[off:off + py_len * 2].decode("utf-16le", errors="ignore");
+            code_span = (off, off + py_len * 2)
             off += py_len * 2
-            word = data[off:off + word_len * 2].decode("utf-16le", errors="ignore");
+            recs.append((_B_CODED, freq, code_span, off, off + word_len * 2))
             off += word_len * 2
-            out.append(Entry(word=word, pinyin=[code], freq=freq))
             continue
 
         # Type 2 (english)
-        sm_idx = peek0
-        if sm_idx >= len(BDICT_SM) and sm_idx != 0xFF:
+        if _LEAD_TYPE[peek0] == _B_ENGLISH:
             off += 1
-            if remain() < py_len:
+            if n - off < py_len:
                 break
-            eng = data[off:off + py_len].decode("ascii", errors="ignore");
+            recs.append((_B_ENGLISH, freq, None, off, off + py_len))
             off += py_len
-            out.append(Entry(word=eng, pinyin=[eng], freq=freq))
             continue
 
         # Type 1 (normal)
+        if n - off < py_len * 2:
+            break
         pinyin: List[str] = []
         ok = True
-        for _ in range(py_len):
-            if remain() < 2:
-                ok = False
-                break
-            sm_i, ym_i = data[off], data[off + 1];
-            off += 2
+        for v in _u16_seq(data[off:off + py_len * 2]):
+            sm_i, ym_i = v & 0xFF, v >> 8
             if sm_i == 0xFF:
                 pinyin.append(chr(ym_i))
             else:
-                if sm_i >= len(BDICT_SM) or ym_i >= len(BDICT_YM):
+                if sm_i >= _NSM or ym_i >= _NYM:
                     ok = False
                     break
-                pinyin.append(BDICT_SM[sm_i] + BDICT_YM[ym_i])
+                pinyin.append(BDICT_COMBO[sm_i * _NYM + ym_i])
         if not ok:
             break
-        need = py_len * 2
-        if remain() < need:
+        off += py_len * 2
+        if n - off < py_len * 2:
             break
-        word = data[off:off + need].decode("utf-16le", errors="ignore");
-        off += need
-        out.append(Entry(word=word, pinyin=pinyin, freq=freq))
-
-    return out
+        recs.append((_B_NORMAL, freq, pinyin, off, off + py_len * 2))
+        off += py_len * 2
+
+    return recs
+
+
+def _decode_utf16_spans(data, spans: List[Tuple[int, int]]) -> List[str]:
+    """把多个 UTF-16LE 区间拼成一块、整体解码一次，再按 U+0000 分隔符切回。
+
+    词库内容不含 NUL，单次大块解码把 N 次短字符串 decode 的固定开销摊平。
+    大块用 replace 而非 ignore：错误替换不会吞掉分隔符，切分位置保持稳定。
+    """
+    big = b"\x00\x00".join(bytes(data[s:e]) for s, e in spans)
+    return big.decode("utf-16-le", errors="replace").split("\x00")
+
+
+def _parse_baidu_buf(data, start_offset: int) -> Entries:
+    recs = _scan_baidu(data, start_offset)
+    spans: List[Tuple[int, int]] = []
+    for kind, _freq, py, ws, we in recs:
+        if kind == _B_CODED:
+            spans.append(py)
+        if kind != _B_ENGLISH:
+            spans.append((ws, we))
+    texts = iter(_decode_utf16_spans(data, spans))
+
+    words: List[str] = []
+    pinyins: List[str] = []
+    freqs = array.array("I")
+    for kind, freq, py, ws, we in recs:
+        if kind == _B_NORMAL:
+            words.append(next(texts))
+            pinyins.append(" ".join(py))
+        elif kind == _B_ENGLISH:
+            try:
+                eng = data[ws:we].tobytes().decode("ascii")
+            except UnicodeDecodeError:
+                continue
+            words.append(eng)
+            pinyins.append(eng)
+        else:
+            code = next(texts)
+            words.append(next(texts))
+            pinyins.append(code)
+        freqs.append(freq)
+    return words, pinyins, freqs
 
 
 # ------------------------- Sogou .scel -------------------------
-def _read_pinyin_table_scel(data: bytes, start_py: int, start_chinese: int) -> Dict[int, str]:
+def _read_pinyin_table_scel(data, start_py: int, start_chinese: int) -> Dict[int, str]:
     pos = start_py + 4
-    py_table: Dict[int, str] = {}
+    indexes: List[int] = []
+    spans: List[Tuple[int, int]] = []
     while pos + 4 <= len(data) and pos < start_chinese:
-        index = data[pos] | (data[pos + 1] << 8);
-        pos += 2
-        ln = data[pos] | (data[pos + 1] << 8);
-        pos += 2
+        index, = _U16(data, pos)
+        ln, = _U16(data, pos + 2)
+        pos += 4
         if ln <= 0 or pos + ln > len(data):
             break
-        py = data[pos:pos + ln].decode("utf-16le", errors="ignore");
+        indexes.append(index)
+        spans.append((pos, pos + ln))
         pos += ln
-        py_table[index] = py
-    return py_table
+    return dict(zip(indexes, _decode_utf16_spans(data, spans)))
 
 
-def _parse_py_indexes_scel(py_bytes: bytes, py_table: Dict[int, str]) -> List[str]:
-    out: List[str] = []
+@functools.lru_cache(maxsize=8)
+def _read_py_table_cached(header: bytes) -> Dict[int, str]:
+    # 同源的多个 .scel 常带相同的拼音表头，按表头字节缓存省掉重复重建
+    return _read_pinyin_table_scel(header, 0, len(header))
+
+
+def _parse_py_indexes_scel(py_bytes, py_table: Dict[int, str]) -> List[str]:
     if len(py_bytes) % 2 == 1:
         py_bytes = py_bytes[:-1]
-    for i in range(0, len(py_bytes), 2):
-        idx = py_bytes[i] | (py_bytes[i + 1] << 8)
-        p = py_table.get(idx, "")
-        if p:
-            out.append(p)
-    return out
+    return [py_table[i] for i in _u16_seq(py_bytes) if py_table.get(i)]
+
 
+def parse_scel(path: str, start_py: int = SCEL_START_PY, start_chinese: int = SCEL_START_CHINESE) -> Entries:
+    mm = _mmap_file(path)
+    if mm is None:
+        return [], [], array.array("I")
+    try:
+        return _parse_scel_buf(memoryview(mm), start_py, start_chinese)
+    finally:
+        _close_mmap(mm)
 
-def parse_scel(path: str, start_py: int = SCEL_START_PY, start_chinese: int = SCEL_START_CHINESE) -> List[Entry]:
-    data = open(path, "rb").read()
-    py_table = _read_pinyin_table_scel(data, start_py, start_chinese)
+
+def _parse_scel_buf(data, start_py: int, start_chinese: int) -> Entries:
+    py_table = _read_py_table_cached(bytes(data[start_py:start_chinese]))
     pos = start_chinese
     n = len(data)
-    out: List[Entry] = []
+    words: List[str] = []
+    pinyins: List[str] = []
+    freqs = array.array("I")
 
     def remain() -> int:
         return n - pos
 
-    def _u16le_mem(b: bytes, p: int) -> Tuple[int, int]:
-        if p + 2 > len(b): raise EOFError
-        return b[p] | (b[p + 1] << 8), p + 2
-
     while remain() > 8:
-        try:
-            same, pos = _u16le_mem(data, pos)
-            py_idx_len, pos = _u16le_mem(data, pos)
-        except EOFError:
-            break
+        same, = _U16(data, pos)
+        py_idx_len, = _U16(data, pos + 2)
+        pos += 4
         if py_idx_len <= 0 or remain() < py_idx_len:
             break
         py_idx = data[pos:pos + py_idx_len];
         pos += py_idx_len
-        py_list = _parse_py_indexes_scel(py_idx, py_table)
+        # 同一拼音组下 same 个同音词共享同一条 intern 过的拼音串
+        py_joined = sys.intern(" ".join(_parse_py_indexes_scel(py_idx, py_table)))
 
         for _ in range(same):
             if remain() < 2: break
-            wlen, pos = _u16le_mem(data, pos)
+            wlen, = _U16(data, pos)
+            pos += 2
             if wlen <= 0 or remain() < wlen: break
-            word = data[pos:pos + wlen].decode("utf-16le", errors="ignore");
+            # strict 解码命中 CPython 的快路径；坏条目跳过而不是带着脏数据入表
+            try:
+                word = data[pos:pos + wlen].tobytes().decode("utf-16-le")
+            except UnicodeDecodeError:
+                word = None
             pos += wlen
 
             if remain() < 2: break
-            ext_len, pos = _u16le_mem(data, pos)
+            ext_len, = _U16(data, pos)
+            pos += 2
             if ext_len < 0 or remain() < ext_len: break
             ext = data[pos:pos + ext_len];
             pos += ext_len
             freq = int.from_bytes(ext[:2], "little", signed=False) if len(ext) >= 2 else 0
 
-            out.append(Entry(word=word, pinyin=py_list, freq=freq))
-    return out
+            if word is not None:
+                words.append(word)
+                pinyins.append(py_joined)
+                freqs.append(freq)
+    return words, pinyins, freqs
 
 
 # ------------------------- Runner -------------------------
-BAIDU_SUFFIXES = {".bdict", ".bcd"}
-SOGOU_SUFFIXES = {".scel"}
+BAIDU_SUFFIXES = (".bdict", ".bcd")
+SOGOU_SUFFIXES = (".scel",)
+
+
+def _convert_one(task: Tuple[str, bool]) -> Tuple[bool, str]:
+    """转换单个词库文件，返回 (是否成功, 日志行)。需为模块级函数以便子进程调用。"""
+    in_path, do_baidu = task
+    try:
+        if do_baidu:
+            entries = parse_baidu(in_path, start_offset=BAIDU_START_OFFSET)
+        else:
+            entries = parse_scel(in_path, start_py=SCEL_START_PY, start_chinese=SCEL_START_CHINESE)
+
+        base = os.path.splitext(in_path)[0]
+        dict_name = os.path.basename(base) if RIME_NAME_MODE == "basename" else RIME_FIXED_NAME
+        n_entries = write_outputs(entries, base + ".txt", base + ".dict.yaml", dict_name,
+                                  want_txt=WRITE_TXT, want_yaml=WRITE_RIME)
+
+        outs = []
+        if WRITE_TXT:
+            outs.append(base + ".txt")
+        if WRITE_RIME:
+            outs.append(base + ".dict.yaml")
+        kind = "Baidu" if do_baidu else "Sogou"
+        return True, f"[OK] {kind} -> {', '.join(outs)}  ({n_entries} entries)"
+    except Exception as e:
+        return False, f"[ERR] {in_path}: {e}"
+
+
+def _prefetch_files(paths: List[str]) -> None:
+    """后台线程：提前向内核声明将读取这些文件，让页缓存在解析前预热。"""
+    for p in paths:
+        try:
+            fd = os.open(p, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+def _iter_dict_files(root_path: str) -> Iterator[Tuple[str, bool]]:
+    """用 scandir 枚举待转换文件，目录项类型直接来自 dirent，免去逐个 stat。"""
+    stack = [root_path]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if RECURSE:
+                        stack.append(entry.path)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                name = entry.name.lower()
+                if INCLUDE_BAIDU and name.endswith(BAIDU_SUFFIXES):
+                    yield entry.path, True
+                elif INCLUDE_SOGOU and name.endswith(SOGOU_SUFFIXES):
+                    yield entry.path, False
 
 
 def process_dir(root: str) -> None:
     root_path = os.path.abspath(root)
-    total_files = 0
-    converted = 0
-    for dirpath, _, filenames in os.walk(root_path):
-        if not RECURSE and dirpath != root_path:
-            continue
-        for fname in filenames:
-            ext = os.path.splitext(fname)[1].lower()
-            in_path = os.path.join(dirpath, fname)
-            do_baidu = INCLUDE_BAIDU and ext in BAIDU_SUFFIXES
-            do_sogou = INCLUDE_SOGOU and ext in SOGOU_SUFFIXES
-            if not (do_baidu or do_sogou):
-                continue
+    tasks = list(_iter_dict_files(root_path))
 
-            total_files += 1
-            try:
-                if do_baidu:
-                    entries = parse_baidu(in_path, start_offset=BAIDU_START_OFFSET)
-                else:
-                    entries = parse_scel(in_path, start_py=SCEL_START_PY, start_chinese=SCEL_START_CHINESE)
-
-                base = os.path.splitext(in_path)[0]
-                if WRITE_TXT:
-                    write_words_txt(entries, base + ".txt")
-                if WRITE_RIME:
-                    dict_name = os.path.basename(base) if RIME_NAME_MODE == "basename" else RIME_FIXED_NAME
-                    write_rime_yaml(entries, base + ".dict.yaml", name=dict_name)
-
-                converted += 1
-                kind = "Baidu" if do_baidu else "Sogou"
-                outs = []
-                if WRITE_TXT: outs.append(base + ".txt")
-                if WRITE_RIME: outs.append(base + ".dict.yaml")
-                print(f"[OK] {kind} -> {', '.join(outs)}  ({len(entries)} entries)")
-            except Exception as e:
-                print(f"[ERR] {in_path}: {e}")
-    print(f"Done. scanned={total_files} converted={converted}")
+    # 预取与解析重叠：磁盘读取藏在 CPU 解析时间后面
+    if tasks and hasattr(os, "posix_fadvise"):
+        threading.Thread(target=_prefetch_files,
+                         args=([p for p, _ in tasks],), daemon=True).start()
+
+    # 各文件互相独立，解析是 CPU 密集型，多文件时按进程并行
+    if len(tasks) > 1:
+        with ProcessPoolExecutor() as ex:
+            results = list(ex.map(_convert_one, tasks, chunksize=4))
+    else:
+        results = [_convert_one(t) for t in tasks]
+
+    converted = 0
+    for ok, msg in results:
+        print(msg)
+        converted += ok
+    print(f"Done. scanned={len(tasks)} converted={converted}")
 
 
 def main():